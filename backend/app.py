@@ -3,7 +3,7 @@ LinkBeam Backend Server
 Handles device discovery and file sharing on LAN
 """
 
-from flask import Flask, request, jsonify, send_file, send_from_directory, abort
+from flask import Flask, Request, request, jsonify, send_file, send_from_directory, abort
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import socket
@@ -11,6 +11,13 @@ import threading
 import os
 import json
 import time
+import shutil
+import errno
+import io
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 from werkzeug.utils import secure_filename
 import uuid
 from pathlib import Path
@@ -29,6 +36,15 @@ DISCOVERY_PORT = 12346
 FILE_PORT = 12345
 BUFFER_SIZE = 4096
 
+# Storage lifecycle configuration (overridable from the environment)
+STORAGE_QUOTA = int(os.environ.get('STORAGE_QUOTA', 5 * 1024 * 1024 * 1024))  # 5GB total for UPLOAD_FOLDER
+MIN_FREE_DISK = int(os.environ.get('MIN_FREE_DISK', 200 * 1024 * 1024))        # Always leave 200MB free on the disk
+EVICTION_POLICY = os.environ.get('EVICTION_POLICY', 'lru')  # 'lru' (least recently used) or 'age' (oldest upload)
+MAX_FILE_AGE = int(os.environ['MAX_FILE_AGE']) if os.environ.get('MAX_FILE_AGE') else None  # Seconds; None disables
+EXPIRY_INTERVAL = 60                    # Seconds between expiry checks
+RESERVATION_PREFIX = '.reserve-'
+STALE_RESERVATION_AGE = 3600            # Placeholders untouched this long belong to dead uploads
+
 # Ensure upload folder exists with proper permissions
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.chmod(UPLOAD_FOLDER, 0o755)
@@ -160,6 +176,259 @@ class DeviceDiscovery:
 discovery_service = DeviceDiscovery()
 
 
+class StorageFullError(Exception):
+    """Raised when an upload cannot be admitted within quota or disk space"""
+
+
+class ReservedFile(io.FileIO):
+    """Placeholder file that records how far an upload has written into it"""
+    
+    def __init__(self, path):
+        super().__init__(path, 'r+')
+        self.written = 0
+        
+    def write(self, data):
+        view = memoryview(data)
+        total = 0
+        while total < len(view):
+            total += super().write(view[total:])
+        self.written = max(self.written, self.tell())
+        return total
+
+
+class StorageRequest(Request):
+    """Request that streams an uploaded file straight into its storage reservation"""
+    
+    storage_token = None
+    reserved_stream = None
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.storage_token is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        if self.reserved_stream is not None:
+            abort(400, description="Only one file per upload")
+        self.reserved_stream = ReservedFile(self.storage_token)
+        return self.reserved_stream
+        
+    def close(self):
+        super().close()
+        if self.reserved_stream is not None:
+            self.reserved_stream.close()
+
+
+app.request_class = StorageRequest
+
+
+class StorageManager:
+    """Enforces the upload quota, reserves disk space and evicts old files"""
+    
+    def __init__(self, folder, quota, min_free, policy, max_age):
+        self.folder = folder
+        self.quota = quota
+        self.min_free = min_free
+        self.policy = policy
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.running = False
+        self.expiry_thread = None
+        self.index = {}          # filename -> {'size', 'created', 'last_access'}
+        self.reservations = {}   # placeholder path -> reserved bytes
+        self.allocating = {}     # reservations whose disk space is not allocated yet
+        self._claim_folder()
+        self.scan()
+        
+    def _claim_folder(self):
+        """
+        State lives in this process, so only one process may manage the folder.
+        Several workers would each see the full quota and the others' uploads
+        would go unaccounted.
+        """
+        if fcntl is None:
+            return
+        self.lock_file = open(os.path.join(self.folder, '.storage.lock'), 'w')
+        try:
+            fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            raise RuntimeError(f"Another LinkBeam process manages '{self.folder}'; run a single worker")
+            
+    def start(self):
+        """Start the periodic expiry check (only needed when MAX_FILE_AGE is set)"""
+        if self.running or not self.max_age:
+            return
+        self.running = True
+        self.expiry_thread = threading.Thread(target=self._expire_periodically, daemon=True)
+        self.expiry_thread.start()
+        
+    def stop(self):
+        """Stop the periodic expiry check"""
+        self.running = False
+        
+    def scan(self):
+        """Rebuild the index from disk and drop placeholders left by crashed uploads"""
+        with self.lock:
+            self.index.clear()
+            for filename in os.listdir(self.folder):
+                filepath = os.path.join(self.folder, filename)
+                if not os.path.isfile(filepath):
+                    continue
+                stat = os.stat(filepath)
+                if filename.startswith(RESERVATION_PREFIX):
+                    if time.time() - stat.st_mtime > STALE_RESERVATION_AGE:
+                        os.remove(filepath)
+                    continue
+                if filename.startswith('.'):
+                    continue
+                self.index[filename] = {
+                    'size': stat.st_size,
+                    'created': stat.st_mtime,
+                    'last_access': max(stat.st_atime, stat.st_mtime)
+                }
+                
+    def reserve(self, size):
+        """
+        Admit an upload of up to size bytes before its body is read and
+        preallocate a placeholder file so the space is held on disk.
+        Nothing is evicted here; commit() makes room once the upload is valid.
+        Returns a token for commit() / release().
+        """
+        with self.lock:
+            self._expire()
+            if size + sum(self.reservations.values()) > self.quota:
+                raise StorageFullError('Storage quota exceeded')
+            if self._disk_free() - size < self.min_free:
+                raise StorageFullError('Insufficient disk space')
+                
+            token = os.path.join(self.folder, f"{RESERVATION_PREFIX}{uuid.uuid4().hex}")
+            self.reservations[token] = size
+            self.allocating[token] = size
+            
+        # Allocate outside the lock, and off the eventlet hub: this may write zeros
+        try:
+            with open(token, 'wb') as f:
+                if socketio.async_mode == 'eventlet':
+                    from eventlet import tpool
+                    tpool.execute(self._allocate, f, size)
+                else:
+                    self._allocate(f, size)
+        except OSError as e:
+            self.release(token)
+            if e.errno in (errno.ENOSPC, errno.EDQUOT):
+                raise StorageFullError('Insufficient disk space')
+            raise
+        finally:
+            with self.lock:
+                self.allocating.pop(token, None)
+        return token
+        
+    def commit(self, token, stream, filepath):
+        """
+        Finish an upload that StorageRequest streamed into its placeholder,
+        evicting files if the quota needs room. Returns the final size.
+        """
+        stream.truncate(stream.written)
+        stream.close()
+        os.chmod(token, 0o644)
+        
+        size = os.path.getsize(token)
+        now = time.time()
+        with self.lock:
+            self.reservations.pop(token, None)
+            pending = sum(self.reservations.values())
+            while self.index and self._used() + pending + size > self.quota:
+                self._evict_one()
+            # Only a complete file is moved to its final name; on failure release() removes the placeholder
+            os.replace(token, filepath)
+            self.index[os.path.basename(filepath)] = {'size': size, 'created': now, 'last_access': now}
+        return size
+        
+    def release(self, token):
+        """Give back a reservation that was not committed (safe to call twice)"""
+        with self.lock:
+            if self.reservations.pop(token, None) is not None and os.path.exists(token):
+                os.remove(token)
+                
+    def touch(self, filename):
+        """Record an access for LRU eviction"""
+        with self.lock:
+            if filename in self.index:
+                self.index[filename]['last_access'] = time.time()
+                
+    def usage(self):
+        """Current storage usage for the API"""
+        with self.lock:
+            disk = shutil.disk_usage(self.folder)
+            return {
+                'used': self._used(),
+                'reserved': sum(self.reservations.values()),
+                'quota': self.quota,
+                'file_count': len(self.index),
+                'disk_free': disk.free,
+                'min_free_disk': self.min_free,
+                'eviction_policy': self.policy,
+                'max_file_age': self.max_age
+            }
+            
+    def _allocate(self, f, size):
+        """Hold size bytes on disk for an open placeholder file"""
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), 0, size)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL):
+                    raise
+        # No fallocate (e.g. macOS or the filesystem lacks it): write zeros so the blocks are really taken
+        chunk = b'\0' * (1024 * 1024)
+        remaining = size
+        while remaining > 0:
+            remaining -= f.write(chunk[:remaining])
+        f.flush()
+        os.fsync(f.fileno())
+        
+    def _used(self):
+        return sum(entry['size'] for entry in self.index.values())
+        
+    def _disk_free(self):
+        """Free disk space, minus reservations still being allocated"""
+        return shutil.disk_usage(self.folder).free - sum(self.allocating.values())
+        
+    def _policy_key(self, filename):
+        entry = self.index[filename]
+        return entry['last_access'] if self.policy == 'lru' else entry['created']
+        
+    def _evict_one(self):
+        """Remove the file that comes first under the eviction policy"""
+        filename = min(self.index, key=self._policy_key)
+        self._remove(filename)
+        
+    def _expire(self):
+        """Remove files older than max_age under the eviction policy"""
+        if not self.max_age:
+            return
+        cutoff = time.time() - self.max_age
+        for filename in [name for name in self.index if self._policy_key(name) < cutoff]:
+            self._remove(filename)
+            
+    def _expire_periodically(self):
+        """Run expiry even when no uploads arrive"""
+        while self.running:
+            with self.lock:
+                self._expire()
+            time.sleep(EXPIRY_INTERVAL)
+            
+    def _remove(self, filename):
+        del self.index[filename]
+        try:
+            os.remove(os.path.join(self.folder, filename))
+        except FileNotFoundError:
+            pass
+        print(f"Evicted {filename}")
+
+
+# Initialize storage manager
+storage_manager = StorageManager(UPLOAD_FOLDER, STORAGE_QUOTA, MIN_FREE_DISK, EVICTION_POLICY, MAX_FILE_AGE)
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -187,39 +456,56 @@ def get_discovered_devices():
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """Handle file upload with security checks"""
-    if 'file' not in request.files:
+    # Admit the upload before reading its body (request.files parses it)
+    size = request.content_length
+    if size is None:
+        return jsonify({'error': 'Content-Length required'}), 411
+    if size == 0:
         return jsonify({'error': 'No file provided'}), 400
-        
-    file = request.files['file']
-    
-    if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
+    if size > app.config['MAX_CONTENT_LENGTH']:
+        abort(413)
+    try:
+        token = storage_manager.reserve(size)
+    except StorageFullError as e:
+        return jsonify({'error': str(e)}), 507
     
-    if not allowed_file(file.filename):
-        return jsonify({'error': 'File type not allowed'}), 400
+    # The file part is written straight into the reservation (see StorageRequest)
+    request.storage_token = token
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+            
+        file = request.files['file']
+        
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'File type not allowed'}), 400
+            
+        filename = secure_filename(file.filename)
+        if not filename:
+            return jsonify({'error': 'Invalid filename'}), 400
         
-    filename = secure_filename(file.filename)
-    if not filename:
-        return jsonify({'error': 'Invalid filename'}), 400
-    
-    filepath = safe_join(UPLOAD_FOLDER, filename)
-    
-    # Add timestamp if file exists
-    if os.path.exists(filepath):
-        name, ext = os.path.splitext(filename)
-        filename = f"{name}_{int(time.time())}{ext}"
         filepath = safe_join(UPLOAD_FOLDER, filename)
-    
-    try:
-        file.save(filepath)
-        os.chmod(filepath, 0o644)
-    except Exception as e:
-        return jsonify({'error': f'Failed to save file: {str(e)}'}), 500
+        
+        # Add timestamp if file exists
+        if os.path.exists(filepath):
+            name, ext = os.path.splitext(filename)
+            filename = f"{name}_{int(time.time())}{ext}"
+            filepath = safe_join(UPLOAD_FOLDER, filename)
+        
+        try:
+            saved_size = storage_manager.commit(token, file.stream, filepath)
+        except Exception as e:
+            return jsonify({'error': f'Failed to save file: {str(e)}'}), 500
+    finally:
+        storage_manager.release(token)
     
     return jsonify({
         'success': True,
         'filename': filename,
-        'size': os.path.getsize(filepath)
+        'size': saved_size
     })
 
 
@@ -235,6 +521,7 @@ def download_file(filename):
     if not os.path.exists(filepath) or not os.path.isfile(filepath):
         abort(404, description="File not found")
     
+    storage_manager.touch(filename)
     try:
         return send_file(filepath, as_attachment=True, download_name=filename)
     except Exception as e:
@@ -247,6 +534,8 @@ def list_files():
     files = []
     try:
         for filename in os.listdir(UPLOAD_FOLDER):
+            if filename.startswith('.'):  # Reservations and lock file
+                continue
             filepath = safe_join(UPLOAD_FOLDER, filename)
             if os.path.isfile(filepath):
                 files.append({
@@ -259,6 +548,12 @@ def list_files():
     return jsonify(files)
 
 
+@app.route('/api/storage', methods=['GET'])
+def get_storage_usage():
+    """Get current storage usage, quota and eviction settings"""
+    return jsonify(storage_manager.usage())
+
+
 @app.route('/')
 def serve_react():
     """Serve the React app"""
@@ -315,6 +610,7 @@ def handle_device_request():
 if __name__ == '__main__':
     # Start device discovery
     discovery_service.start()
+    storage_manager.start()
     
     print(f"LinkBeam Server Starting...")
     print(f"Device ID: {DEVICE_ID}")
@@ -323,6 +619,8 @@ if __name__ == '__main__':
     print(f"Server Port: 5000")
     print(f"Discovery Port: {DISCOVERY_PORT}")
     print(f"Max File Size: 500MB")
+    print(f"Storage Quota: {STORAGE_QUOTA // (1024 * 1024)}MB ({EVICTION_POLICY} eviction)")
+    print(f"File Expiry: {MAX_FILE_AGE}s" if MAX_FILE_AGE else "File Expiry: disabled")
     print(f"Allowed Extensions: {', '.join(ALLOWED_EXTENSIONS)}")
     
     # Run the Flask app with SocketIO (use production server for deployment)
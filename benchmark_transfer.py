@@ -0,0 +1,112 @@
+"""
+LinkBeam Transfer Benchmark
+Compares plaintext and encrypted link_beam.py transfers over loopback
+
+Usage: python benchmark_transfer.py [size_mb]
+"""
+
+import os
+import sys
+import hashlib
+import socket
+import tempfile
+import threading
+import time
+
+import beam_crypto
+
+BUFFER_SIZE = 4096 * 4  # Same chunk size as the plaintext path in link_beam.py
+
+
+def send_plain(sock, f):
+    while True:
+        bytes_read = f.read(BUFFER_SIZE)
+        if not bytes_read:
+            break
+        sock.sendall(bytes_read)
+
+
+def receive_plain(sock, f, filesize):
+    received_total = 0
+    while received_total < filesize:
+        bytes_read = sock.recv(BUFFER_SIZE)
+        if not bytes_read:
+            break
+        f.write(bytes_read)
+        received_total += len(bytes_read)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def run_transfer(src_path, dst_path, encrypted, workers=beam_crypto.CRYPTO_WORKERS):
+    """Send src_path to dst_path over a loopback socket, returning elapsed seconds"""
+    filesize = os.path.getsize(src_path)
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    port = server.getsockname()[1]
+
+    if encrypted:
+        send_key, send_public = beam_crypto.generate_keypair()
+        recv_key, recv_public = beam_crypto.generate_keypair()
+        transcript = f"bench|{filesize}|{send_public}|{recv_public}".encode()
+        send_cipher, _ = beam_crypto.derive_session(send_key, recv_public, transcript)
+        recv_cipher, _ = beam_crypto.derive_session(recv_key, send_public, transcript)
+
+    def receiver():
+        conn, _ = server.accept()
+        with conn, open(dst_path, "wb") as f:
+            if encrypted:
+                beam_crypto.receive_encrypted(conn, f, recv_cipher, filesize, workers=workers)
+            else:
+                receive_plain(conn, f, filesize)
+
+    thread = threading.Thread(target=receiver)
+    thread.start()
+    start = time.perf_counter()
+    with socket.create_connection(('127.0.0.1', port)) as s, open(src_path, "rb") as f:
+        if encrypted:
+            beam_crypto.send_encrypted(s, f, send_cipher, workers=workers)
+        else:
+            send_plain(s, f)
+    thread.join()
+    elapsed = time.perf_counter() - start
+    server.close()
+    return elapsed
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    with tempfile.TemporaryDirectory() as tmp:
+        src_path = os.path.join(tmp, "source.bin")
+        dst_path = os.path.join(tmp, "received.bin")
+        with open(src_path, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+
+        pool_workers = max(2, os.cpu_count() or 1)
+        cases = [
+            ("plaintext", False, 1),
+            ("encrypted, inline", True, 1),
+            (f"encrypted, {pool_workers}-worker pool", True, pool_workers),
+        ]
+        print(f"Transferring {size_mb} MB over loopback ({os.cpu_count()} CPUs)")
+        expected = file_digest(src_path)
+        baseline = None
+        for name, encrypted, workers in cases:
+            elapsed = run_transfer(src_path, dst_path, encrypted, workers)
+            if file_digest(dst_path) != expected:
+                raise SystemExit(f"{name}: received file does not match the source")
+            throughput = size_mb / elapsed
+            baseline = baseline or throughput
+            print(f"  {name:<24} {throughput:8.1f} MB/s  ({throughput / baseline:.0%} of plaintext)")
+
+
+if __name__ == "__main__":
+    main()
@@ -77,7 +77,8 @@ case $option in
     2)
         echo "Starting production server with Gunicorn..."
         cd backend
-        gunicorn -w 4 -b 0.0.0.0:5000 --worker-class eventlet -m 007 app:app
+        # Single worker: storage quota state and Socket.IO sessions live in the process
+        gunicorn -w 1 -b 0.0.0.0:5000 --worker-class eventlet -m 007 app:app
         ;;
     *)
         echo "Invalid option"
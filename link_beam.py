@@ -1,8 +1,12 @@
 import customtkinter
 import socket
-from tkinter import filedialog
+from tkinter import filedialog, messagebox
 import os
 import threading
+try:
+    import beam_crypto  # Needs the optional 'cryptography' package
+except ImportError:
+    beam_crypto = None
 
 # --- App Settings ---
 APP_NAME = "LinkBeam"
@@ -11,6 +15,7 @@ THEME = "dark"  # or "light"
 ACCENT_COLOR = "blue"  # or "green", etc.
 PORT = 12345
 BUFFER_SIZE = 4096 * 4 # Increased buffer for speed
+CODE_DISPLAY_MS = 60000 # Keep the encryption code on screen long enough to compare
 
 # --- Main Application Class ---
 class App(customtkinter.CTk):
@@ -54,6 +59,13 @@ class App(customtkinter.CTk):
         self.ip_entry = customtkinter.CTkEntry(self.send_frame, placeholder_text="Enter Receiver's IP Address")
         self.ip_entry.pack(pady=20, padx=20, fill="x")
 
+        self.encrypt_switch = customtkinter.CTkSwitch(self.send_frame, text="Encrypt transfer")
+        self.encrypt_switch.pack(pady=5)
+        if beam_crypto:
+            self.encrypt_switch.select()
+        else:
+            self.encrypt_switch.configure(state="disabled", text="Encryption unavailable (pip install cryptography)")
+
         self.send_button = customtkinter.CTkButton(self.send_frame, text="Send File", command=self.send_file_thread)
         self.send_button.pack(pady=10, side="bottom")
 
@@ -108,6 +120,22 @@ class App(customtkinter.CTk):
             s.close()
         return IP
 
+    def confirm_code(self, code):
+        """ Asks the sender (on the UI thread) whether the receiver shows the same code """
+        answer = {}
+        done = threading.Event()
+
+        def ask():
+            answer['ok'] = messagebox.askyesno(
+                "Verify Encryption",
+                f"Does the receiver show code {code}?\n\nOnly continue if both codes match."
+            )
+            done.set()
+
+        self.after(0, ask)
+        done.wait()
+        return answer['ok']
+
     # --- Send Logic ---
     def send_file_thread(self):
         """ Starts the file sending process in a new thread """
@@ -126,6 +154,7 @@ class App(customtkinter.CTk):
 
     def send_file(self, receiver_ip):
         """ Handles the logic of sending a file """
+        security_note = ""
         try:
             self.send_button.configure(state="disabled")
             self.status_label.pack(pady=10, side="bottom", fill="x")
@@ -139,25 +168,50 @@ class App(customtkinter.CTk):
             # Send file info
             filename = os.path.basename(self.file_to_send)
             filesize = os.path.getsize(self.file_to_send)
-            s.send(f"{filename}|{filesize}".encode())
-
-            # Wait for receiver's confirmation
-            s.recv(BUFFER_SIZE)
+            encrypt = bool(self.encrypt_switch.get())
+            if encrypt:
+                # Commit to our key first; it is only revealed after the receiver's key arrives
+                private_key, public_hex = beam_crypto.generate_keypair()
+                header = f"{filename}|{filesize}|{beam_crypto.KEY_EXCHANGE}|{beam_crypto.commit_key(public_hex)}"
+            else:
+                header = f"{filename}|{filesize}"
+            s.send(header.encode())
+
+            # Wait for receiver's confirmation (carries its public key when encrypting)
+            reply = s.recv(BUFFER_SIZE).decode()
+            if encrypt:
+                status, _, peer_hex = reply.partition('|')
+                if status != "OK" or not peer_hex:
+                    raise ConnectionError("Receiver does not support encryption")
+                s.sendall(public_hex.encode())
+                cipher, code = beam_crypto.derive_session(private_key, peer_hex, f"{header}|{peer_hex}|{public_hex}".encode())
+                security_note = f" (encrypted, code {code})"
+
+                # No file data leaves this machine until the codes are confirmed to match
+                self.status_label.configure(text=f"Confirm code {code} with the receiver...")
+                if not self.confirm_code(code):
+                    raise ConnectionError("Transfer cancelled: code not confirmed")
+
+            def report_progress(sent_total):
+                progress = (sent_total / filesize) if filesize else 1
+                self.progress_bar.set(progress)
+                self.status_label.configure(text=f"Sending... {int(progress*100)}%{security_note}")
 
             # Send file data
             sent_total = 0
             with open(self.file_to_send, "rb") as f:
-                while True:
-                    bytes_read = f.read(BUFFER_SIZE)
-                    if not bytes_read:
-                        break # file transfer is done
-                    s.sendall(bytes_read)
-                    sent_total += len(bytes_read)
-                    progress = (sent_total / filesize)
-                    self.progress_bar.set(progress)
-                    self.status_label.configure(text=f"Sending... {int(progress*100)}%")
-
-            self.status_label.configure(text="File sent successfully!", text_color="green")
+                if encrypt:
+                    beam_crypto.send_encrypted(s, f, cipher, report_progress)
+                else:
+                    while True:
+                        bytes_read = f.read(BUFFER_SIZE)
+                        if not bytes_read:
+                            break # file transfer is done
+                        s.sendall(bytes_read)
+                        sent_total += len(bytes_read)
+                        report_progress(sent_total)
+
+            self.status_label.configure(text=f"File sent successfully!{security_note}", text_color="green")
 
         except Exception as e:
             self.status_label.configure(text=f"Error: {e}", text_color="red")
@@ -165,7 +219,7 @@ class App(customtkinter.CTk):
             s.close()
             self.send_button.configure(state="normal")
             self.progress_bar.after(3000, self.progress_bar.pack_forget)
-            self.status_label.after(3000, lambda: self.status_label.configure(text=""))
+            self.status_label.after(CODE_DISPLAY_MS if security_note else 3000, lambda: self.status_label.configure(text=""))
 
     # --- Receive Logic ---
     def start_receiving_thread(self):
@@ -192,8 +246,10 @@ class App(customtkinter.CTk):
             self.receive_status_label.configure(text="Listening for incoming files...")
 
             while self.is_receiving:
+                security_note = None  # Stays None until a connection is accepted
                 try:
                     conn, addr = server_socket.accept()
+                    security_note = ""
                     with conn:
                         self.status_label.pack(pady=10, side="bottom", fill="x")
                         self.progress_bar.pack(pady=10, padx=20, fill="x")
@@ -202,11 +258,25 @@ class App(customtkinter.CTk):
 
                         # Receive file info
                         received_data = conn.recv(BUFFER_SIZE).decode()
-                        filename, filesize = received_data.split('|')
-                        filesize = int(filesize)
-                        
-                        # Tell sender we're ready
-                        conn.send("OK".encode())
+                        fields = received_data.split('|')
+                        filename, filesize = fields[0], int(fields[1])
+                        encrypted = len(fields) == 4
+
+                        # Tell sender we're ready, answering its key exchange if requested
+                        if encrypted:
+                            if not beam_crypto or fields[2] != beam_crypto.KEY_EXCHANGE:
+                                conn.send("UNSUPPORTED".encode())
+                                raise ConnectionError("Sender requested unsupported encryption")
+                            private_key, public_hex = beam_crypto.generate_keypair()
+                            conn.send(f"OK|{public_hex}".encode())
+                            # The sender reveals its key only now, and it must match the commitment
+                            peer_hex = beam_crypto.recv_exact(conn, beam_crypto.PUBLIC_KEY_HEX_SIZE).decode()
+                            beam_crypto.verify_commitment(peer_hex, fields[3])
+                            cipher, code = beam_crypto.derive_session(private_key, peer_hex, f"{received_data}|{public_hex}|{peer_hex}".encode())
+                            security_note = f" (encrypted, code {code})"
+                            self.status_label.configure(text=f"Code {code}: waiting for sender to confirm...")
+                        else:
+                            conn.send("OK".encode())
 
                         # Create a 'downloads' directory if it doesn't exist
                         if not os.path.exists('downloads'):
@@ -215,28 +285,41 @@ class App(customtkinter.CTk):
                         filename = os.path.join('downloads', os.path.basename(filename))
 
                         # Receive file data
+                        def report_progress(received_total):
+                            progress = (received_total / filesize) if filesize else 1
+                            self.progress_bar.set(progress)
+                            self.status_label.configure(text=f"Receiving... {int(progress*100)}%{security_note}")
+
                         received_total = 0
                         with open(filename, "wb") as f:
-                            while received_total < filesize:
-                                bytes_read = conn.recv(BUFFER_SIZE)
-                                if not bytes_read:
-                                    break
-                                f.write(bytes_read)
-                                received_total += len(bytes_read)
-                                progress = (received_total / filesize)
-                                self.progress_bar.set(progress)
-                                self.status_label.configure(text=f"Receiving... {int(progress*100)}%")
-
-                        self.status_label.configure(text=f"File '{os.path.basename(filename)}' received!", text_color="green")
+                            if encrypted:
+                                try:
+                                    beam_crypto.receive_encrypted(conn, f, cipher, filesize, report_progress)
+                                except Exception:
+                                    # Never leave unauthenticated data behind
+                                    f.close()
+                                    os.remove(filename)
+                                    raise
+                            else:
+                                while received_total < filesize:
+                                    bytes_read = conn.recv(BUFFER_SIZE)
+                                    if not bytes_read:
+                                        break
+                                    f.write(bytes_read)
+                                    received_total += len(bytes_read)
+                                    report_progress(received_total)
+
+                        self.status_label.configure(text=f"File '{os.path.basename(filename)}' received!{security_note}", text_color="green")
                 except socket.timeout:
                     # Just loop again to check the self.is_receiving flag
                     continue
                 except Exception as e:
                     self.status_label.configure(text=f"Error: {e}", text_color="red")
                 finally:
-                    # Clean up UI for the next transfer
-                    self.progress_bar.after(3000, self.progress_bar.pack_forget)
-                    self.status_label.after(3000, lambda: self.status_label.configure(text=""))
+                    # Clean up UI for the next transfer (accept timeouts must not clear the last result)
+                    if security_note is not None:
+                        self.progress_bar.after(3000, self.progress_bar.pack_forget)
+                        self.status_label.after(CODE_DISPLAY_MS if security_note else 3000, lambda: self.status_label.configure(text=""))
                     self.receive_status_label.configure(text="Listening for incoming files...")
 
 
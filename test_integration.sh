@@ -38,7 +38,8 @@ test_endpoint() {
 # Start backend
 echo "Starting backend server..."
 cd backend
-python app.py > /tmp/test_backend.log 2>&1 &
+# Small quota so the 507 (storage full) path can be exercised
+STORAGE_QUOTA=4096 python app.py > /tmp/test_backend.log 2>&1 &
 BACKEND_PID=$!
 cd ..
 
@@ -54,6 +55,7 @@ test_endpoint "Health Check" "http://localhost:5000/api/health" "ok"
 test_endpoint "Device Info" "http://localhost:5000/api/device/info" "device_id"
 test_endpoint "Device List" "http://localhost:5000/api/devices" "\\["
 test_endpoint "Files List" "http://localhost:5000/api/files" "\\["
+test_endpoint "Storage Usage" "http://localhost:5000/api/storage" "quota"
 
 # Test file upload
 echo -n "Testing File Upload... "
@@ -67,6 +69,20 @@ else
     ((FAILED++))
 fi
 
+# Test storage admission control (upload larger than the quota)
+echo -n "Testing Storage Full (507)... "
+head -c 8192 /dev/zero > /tmp/test_too_big.txt
+response=$(curl -s -o /dev/null -w "%{http_code}" -X POST -F "file=@/tmp/test_too_big.txt" http://localhost:5000/api/upload)
+if [ "$response" = "507" ]; then
+    echo -e "${GREEN}✓ PASSED${NC}"
+    ((PASSED++))
+else
+    echo -e "${RED}✗ FAILED${NC}"
+    echo "  Expected: 507"
+    echo "  Got: $response"
+    ((FAILED++))
+fi
+
 # Test file download
 echo -n "Testing File Download... "
 response=$(curl -s -o /tmp/test_download.txt -w "%{http_code}" http://localhost:5000/api/download/test_upload.txt)
@@ -93,7 +109,7 @@ fi
 
 # Cleanup
 kill $BACKEND_PID 2>/dev/null
-rm -f /tmp/test_upload.txt /tmp/test_download.txt
+rm -f /tmp/test_upload.txt /tmp/test_download.txt /tmp/test_too_big.txt
 
 # Summary
 echo ""